@@ -3,9 +3,12 @@ Justizfachwirt/in Einstellungstest - Komplettes Trainingssystem
 Mit geometrischen Formen und räumlichem Denken
 Installation: pip install streamlit pandas numpy matplotlib
 Starten: streamlit run justiz_quiz.py
+Sitzungsspeicher: JUSTIZ_SESSION_BACKEND, JUSTIZ_SESSION_DIR, JUSTIZ_SESSION_IDLE_SECONDS,
+                  JUSTIZ_SESSION_MAX_AGE_SECONDS, JUSTIZ_SESSION_LOG_LEVEL (INFO zeigt die Statistik)
 """
 
 import streamlit as st
+import os
 import random
 import time
 import pandas as pd
@@ -14,6 +17,9 @@ from datetime import datetime, timedelta
 import json
 from typing import Dict, List, Tuple, Any
 
+from session_store import (SessionStateManager, SpillableState, configure_logging,
+                           env_seconds, load_backend_class)
+
 # Seitenkonfiguration
 st.set_page_config(
     page_title="Justiz IQ-Training",
@@ -60,16 +66,36 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Session State initialisieren
-if 'initialized' not in st.session_state:
-    st.session_state.initialized = True
-    st.session_state.current_test = []
-    st.session_state.current_question = 0
-    st.session_state.score = 0
-    st.session_state.test_history = []
-    st.session_state.test_active = False
-    st.session_state.show_result = False
-    st.session_state.current_answer = None
+@st.cache_resource
+def get_session_manager():
+    """Prozessweiter Sitzungsspeicher, konfigurierbar über Umgebungsvariablen"""
+    configure_logging(os.environ.get('JUSTIZ_SESSION_LOG_LEVEL'))
+    backend_cls = load_backend_class(os.environ.get('JUSTIZ_SESSION_BACKEND', 'disk'))
+    directory = os.environ.get('JUSTIZ_SESSION_DIR',
+                               os.path.join(os.path.expanduser('~'), '.cache', 'justiz-quiz', 'sessions'))
+    return SessionStateManager(
+        backend_cls(directory),
+        idle_seconds=env_seconds('JUSTIZ_SESSION_IDLE_SECONDS', 900, minimum=60),
+        max_age_seconds=env_seconds('JUSTIZ_SESSION_MAX_AGE_SECONDS', 86400, minimum=3600)
+    )
+
+# Session State initialisieren (auslagerbarer Teil, siehe session_store)
+if 'quiz' not in st.session_state:
+    st.session_state.quiz = SpillableState()
+quiz = st.session_state.quiz
+session_manager = get_session_manager()
+session_manager.touch(quiz)
+session_manager.sweep(quiz)
+
+if 'initialized' not in quiz:
+    quiz.initialized = True
+    quiz.current_test = []
+    quiz.current_question = 0
+    quiz.score = 0
+    quiz.test_history = []
+    quiz.test_active = False
+    quiz.show_result = False
+    quiz.current_answer = None
 
 class GeometricPatternGenerator:
     """Generator für geometrische Muster und räumliche Aufgaben"""
@@ -511,12 +537,12 @@ def main():
         
         if st.button("🚀 Test starten", type="primary", use_container_width=True):
             engine = TestEngine()
-            st.session_state.current_test = engine.create_test(test_type, difficulty, num_questions)
-            st.session_state.current_question = 0
-            st.session_state.score = 0
-            st.session_state.test_history = []
-            st.session_state.test_active = True
-            st.session_state.show_result = False
+            quiz.current_test = engine.create_test(test_type, difficulty, num_questions)
+            quiz.current_question = 0
+            quiz.score = 0
+            quiz.test_history = []
+            quiz.test_active = True
+            quiz.show_result = False
             st.rerun()
         
         if st.button("🔄 Zurücksetzen", type="secondary", use_container_width=True):
@@ -525,7 +551,7 @@ def main():
             st.rerun()
     
     # Hauptbereich
-    if not st.session_state.test_active:
+    if not quiz.test_active:
         # Willkommensbildschirm
         col1, col2 = st.columns(2)
         
@@ -564,13 +590,13 @@ def main():
         
     else:
         # Test läuft
-        if st.session_state.current_question < len(st.session_state.current_test):
+        if quiz.current_question < len(quiz.current_test):
             # Progress bar
-            progress = st.session_state.current_question / len(st.session_state.current_test)
+            progress = quiz.current_question / len(quiz.current_test)
             st.progress(progress)
             
-            question = st.session_state.current_test[st.session_state.current_question]
-            user_answer = display_question(question, st.session_state.current_question)
+            question = quiz.current_test[quiz.current_question]
+            user_answer = display_question(question, quiz.current_question)
             
             col1, col2, col3 = st.columns([1, 1, 1])
             
@@ -585,21 +611,21 @@ def main():
                         correct_idx = question.get('answer', question.get('correct', 0))
                         correct = user_answer == correct_idx
                     
-                    st.session_state.test_history.append({
-                        'question': st.session_state.current_question + 1,
+                    quiz.test_history.append({
+                        'question': quiz.current_question + 1,
                         'correct': correct,
                         'type': question['type']
                     })
                     
                     if correct:
-                        st.session_state.score += 1
+                        quiz.score += 1
                     
-                    st.session_state.show_result = True
+                    quiz.show_result = True
                     st.rerun()
             
             # Ergebnis anzeigen
-            if st.session_state.show_result:
-                last_result = st.session_state.test_history[-1]
+            if quiz.show_result:
+                last_result = quiz.test_history[-1]
                 
                 if last_result['correct']:
                     st.success("✅ Richtig!")
@@ -610,8 +636,8 @@ def main():
                     st.info(question['explanation'])
                 
                 if st.button("Weiter →", type="primary"):
-                    st.session_state.current_question += 1
-                    st.session_state.show_result = False
+                    quiz.current_question += 1
+                    quiz.show_result = False
                     st.rerun()
         
         else:
@@ -620,8 +646,8 @@ def main():
             st.success("🎉 Test abgeschlossen!")
             
             # Ergebnisse
-            total = len(st.session_state.current_test)
-            score = st.session_state.score
+            total = len(quiz.current_test)
+            score = quiz.score
             percentage = (score / total) * 100
             
             col1, col2, col3 = st.columns(3)
@@ -639,11 +665,11 @@ def main():
             
             # Detaillierte Ergebnisse
             st.markdown("### 📊 Detaillierte Auswertung")
-            df = pd.DataFrame(st.session_state.test_history)
+            df = pd.DataFrame(quiz.test_history)
             st.dataframe(df, use_container_width=True)
             
             if st.button("🔄 Neuer Test", type="primary"):
-                st.session_state.test_active = False
+                quiz.test_active = False
                 st.rerun()
 
 if __name__ == "__main__":
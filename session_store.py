@@ -0,0 +1,359 @@
+"""
+Sitzungsspeicher für das Justiz IQ-Training
+Lagert inaktive Sitzungen komprimiert aus und lädt sie bei der nächsten Interaktion zurück
+"""
+
+import importlib
+import json
+import logging
+import math
+import os
+import stat
+import tempfile
+import threading
+import time
+import uuid
+import weakref
+import zlib
+from abc import ABC, abstractmethod
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _encode(data):
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+
+def env_seconds(name: str, default: float, minimum: float) -> float:
+    """Liest eine Sekundenangabe aus der Umgebung, ungültige Werte ergeben den Standard"""
+    try:
+        value = float(os.environ.get(name, default))
+        if not math.isfinite(value):
+            raise ValueError(value)
+    except ValueError:
+        logger.warning("%s ist keine gültige Zahl, verwende %s", name, default)
+        value = default
+    return max(value, minimum)
+
+def configure_logging(level: Optional[str]) -> None:
+    """Gibt die Meldungen des Sitzungsspeichers ab dem angegebenen Level aus"""
+    if not level:
+        return
+    if not isinstance(logging.getLevelName(level.upper()), int):
+        logger.warning("Unbekanntes Log-Level: %s", level)
+        return
+    logger.setLevel(level.upper())
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+        logger.addHandler(handler)
+
+class SpillableState:
+    """Auslagerbarer Teil des Sitzungszustands mit Attributzugriff wie st.session_state
+
+    Das Objekt bleibt in st.session_state liegen, ausgelagert wird nur sein Inhalt.
+    Der eigene Lock schützt den Inhalt beim Auslagern und Zurückholen.
+    """
+
+    __slots__ = ('session_id', 'lock', 'last_seen', 'spilled', 'values', '__weakref__')
+
+    def __init__(self):
+        object.__setattr__(self, 'session_id', uuid.uuid4().hex)
+        object.__setattr__(self, 'lock', threading.Lock())
+        object.__setattr__(self, 'last_seen', time.time())
+        object.__setattr__(self, 'spilled', False)
+        object.__setattr__(self, 'values', {})
+
+    def __getattr__(self, key):
+        try:
+            return self.values[key]
+        except KeyError:
+            raise AttributeError(key) from None
+
+    def __setattr__(self, key, value):
+        if key in self.__slots__:
+            object.__setattr__(self, key, value)
+        else:
+            self.values[key] = value
+
+    def __contains__(self, key):
+        return key in self.values
+
+class SessionStateBackend(ABC):
+    """Schnittstelle für Speicher ausgelagerter Sitzungen
+
+    Implementierungen erhalten den Speicherort als einziges Konstruktorargument.
+    """
+
+    @abstractmethod
+    def save(self, session_id: str, data: Dict[str, Any]) -> int:
+        """Speichert eine Sitzung und gibt die belegten Bytes zurück"""
+
+    @abstractmethod
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Lädt eine Sitzung oder None, falls keine (lesbare) ausgelagert ist"""
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        """Entfernt eine ausgelagerte Sitzung"""
+
+    @abstractmethod
+    def purge(self, max_age: float) -> None:
+        """Entfernt ausgelagerte Sitzungen, die älter als max_age Sekunden sind"""
+
+    @abstractmethod
+    def stats(self) -> Tuple[int, int]:
+        """Anzahl und Gesamtgröße (Bytes) der ausgelagerten Sitzungen"""
+
+class DiskSessionBackend(SessionStateBackend):
+    """Legt Sitzungen als zlib-komprimiertes JSON in einem privaten Verzeichnis ab
+
+    Ein vorhandenes Verzeichnis wird nicht verändert. Ist es für andere Benutzer
+    zugänglich, landen die Dateien in einem eigenen privaten Unterverzeichnis.
+    """
+
+    SUFFIX = '.json.z'
+
+    def __init__(self, directory: str, level: int = 6):
+        self.level = level
+        try:
+            os.makedirs(directory, mode=0o700)
+            # makedirs beachtet die umask, das selbst angelegte Verzeichnis wird privat
+            os.chmod(directory, 0o700)
+        except FileExistsError:
+            if not self._is_private(directory):
+                logger.warning("%s ist nicht privat, verwende ein eigenes Unterverzeichnis", directory)
+                directory = self._private_subdirectory(directory)
+        self.directory = directory
+        self._lock = threading.Lock()
+        # Pfad -> Größe beim Schreiben, damit stats() ohne Verzeichnisscan auskommt
+        self._sizes = {}
+        for path in self._entries():
+            try:
+                self._sizes[path] = os.path.getsize(path)
+            except OSError:
+                continue
+
+    @staticmethod
+    def _is_private(directory):
+        if os.name != 'posix':
+            return True
+        info = os.stat(directory)
+        return info.st_uid == os.getuid() and not stat.S_IMODE(info.st_mode) & 0o077
+
+    @classmethod
+    def _private_subdirectory(cls, directory):
+        """Festes Unterverzeichnis pro Benutzer, damit purge alte Dateien wiederfindet"""
+        subdirectory = os.path.join(directory, f"justiz-sessions-{os.getuid()}")
+        try:
+            os.mkdir(subdirectory, 0o700)
+            os.chmod(subdirectory, 0o700)
+        except FileExistsError:
+            if os.path.islink(subdirectory) or not cls._is_private(subdirectory):
+                return tempfile.mkdtemp(prefix='justiz-sessions-', dir=directory)
+        return subdirectory
+
+    def _path(self, session_id):
+        return os.path.join(self.directory, f"{session_id}{self.SUFFIX}")
+
+    def _entries(self):
+        for name in os.listdir(self.directory):
+            if name.endswith(self.SUFFIX):
+                yield os.path.join(self.directory, name)
+
+    def _remove(self, path):
+        """Löscht eine Datei und aktualisiert die Zähler"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            self._sizes.pop(path, None)
+
+    def save(self, session_id, data):
+        payload = zlib.compress(_encode(data), self.level)
+        path = self._path(session_id)
+        tmp_path = path + '.tmp'
+        # Atomar schreiben, damit nie eine halbe Datei geladen wird
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'wb') as f:
+                f.write(payload)
+            os.replace(tmp_path, path)
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._sizes[path] = len(payload)
+        return len(payload)
+
+    def load(self, session_id):
+        path = self._path(session_id)
+        try:
+            with open(path, 'rb') as f:
+                payload = f.read()
+            data = json.loads(zlib.decompress(payload).decode('utf-8'))
+            if not isinstance(data, dict):
+                raise ValueError("Sitzungsdaten sind kein Objekt")
+        except FileNotFoundError:
+            return None
+        except (OSError, zlib.error, ValueError) as e:
+            # Mit frischem Zustand weitermachen statt bei jedem Rerun zu scheitern
+            logger.warning("Verwerfe unlesbare Sitzung %s: %s", session_id, e)
+            try:
+                self._remove(path)
+            except OSError:
+                pass
+            return None
+        return data
+
+    def delete(self, session_id):
+        self._remove(self._path(session_id))
+
+    def purge(self, max_age):
+        cutoff = time.time() - max_age
+        for path in self._entries():
+            try:
+                expired = os.path.getmtime(path) < cutoff
+            except FileNotFoundError:
+                continue
+            if expired:
+                self._remove(path)
+
+    def stats(self):
+        with self._lock:
+            return len(self._sizes), sum(self._sizes.values())
+
+# Verfügbare Backends, wählbar per Name oder als "modul:Klasse"
+SESSION_BACKENDS = {
+    'disk': DiskSessionBackend
+}
+
+def load_backend_class(spec: str):
+    """Löst einen Backend-Namen oder Importpfad "modul:Klasse" auf"""
+    if spec in SESSION_BACKENDS:
+        return SESSION_BACKENDS[spec]
+    module_name, sep, class_name = spec.partition(':')
+    if not sep:
+        raise ValueError(f"Unbekanntes Sitzungs-Backend: {spec}")
+    backend_cls = getattr(importlib.import_module(module_name), class_name)
+    if not (isinstance(backend_cls, type) and issubclass(backend_cls, SessionStateBackend)):
+        raise ValueError(f"{spec} ist kein SessionStateBackend")
+    return backend_cls
+
+class SessionStateManager:
+    """Lagert inaktive Sitzungen in ein Backend aus und lädt sie bei der nächsten Interaktion zurück
+
+    Sitzungen werden nur schwach referenziert: Geschlossene Tabs gibt Streamlit
+    frei, ihre Einträge und ausgelagerten Daten werden dann verworfen.
+    """
+
+    def __init__(self, backend: SessionStateBackend, idle_seconds: float = 900,
+                 max_age_seconds: float = 86400):
+        self.backend = backend
+        self.idle_seconds = idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self.sweep_interval = max(1, min(60, idle_seconds))
+        # session_id -> schwache Referenz auf den SpillableState
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._last_sweep = 0.0
+
+    def touch(self, state: SpillableState) -> None:
+        """Registriert eine Interaktion und stellt ausgelagerten Zustand wieder her"""
+        with self._lock:
+            self._sessions[state.session_id] = weakref.ref(state)
+        with state.lock:
+            if state.spilled:
+                data = self.backend.load(state.session_id)
+                if data is not None:
+                    state.values.update(data)
+                    try:
+                        self.backend.delete(state.session_id)
+                    except OSError as e:
+                        logger.warning("Ausgelagerte Sitzung %s nicht löschbar: %s",
+                                       state.session_id, e)
+                state.spilled = False
+            state.last_seen = time.time()
+
+    def sweep(self, current: Optional[SpillableState] = None) -> None:
+        """Lagert alle Sitzungen aus, die länger als idle_seconds inaktiv sind"""
+        now = time.time()
+        states, closed = [], []
+        with self._lock:
+            if now - self._last_sweep < self.sweep_interval:
+                return
+            self._last_sweep = now
+            for session_id, ref in list(self._sessions.items()):
+                state = ref()
+                if state is None:
+                    del self._sessions[session_id]
+                    closed.append(session_id)
+                elif state is not current:
+                    states.append(state)
+
+        for session_id in closed:
+            try:
+                self.backend.delete(session_id)
+            except OSError as e:
+                logger.warning("Ausgelagerte Sitzung %s nicht löschbar: %s", session_id, e)
+
+        for state in states:
+            self._spill(state, now)
+
+        try:
+            self.backend.purge(self.max_age_seconds)
+        except OSError as e:
+            logger.warning("Aufräumen ausgelagerter Sitzungen fehlgeschlagen: %s", e)
+
+        if logger.isEnabledFor(logging.INFO):
+            logger.info("Sitzungen: %(resident_sessions)d im Speicher "
+                        "(%(resident_bytes)d B serialisiert), "
+                        "%(spilled_sessions)d ausgelagert (%(spilled_bytes)d B)", self.stats())
+
+    def _spill(self, state, now):
+        # Wer gerade zurückgeholt wird, ist nicht inaktiv
+        if not state.lock.acquire(blocking=False):
+            return
+        try:
+            if state.spilled or not state.values or now - state.last_seen < self.idle_seconds:
+                return
+            try:
+                self.backend.save(state.session_id, state.values)
+            except (OSError, TypeError, ValueError) as e:
+                logger.warning("Auslagern von Sitzung %s fehlgeschlagen: %s", state.session_id, e)
+                # Im Speicher behalten, erneuter Versuch nach der nächsten Leerlaufzeit
+                state.last_seen = time.time()
+                return
+            state.values = {}
+            state.spilled = True
+        finally:
+            state.lock.release()
+
+    def stats(self):
+        """Anzahl der Sitzungen im Speicher und im Backend
+
+        resident_bytes ist die Größe des kompakten JSON-Abbilds, nicht der
+        tatsächliche Speicherverbrauch.
+        """
+        with self._lock:
+            refs = list(self._sessions.values())
+        resident, resident_bytes = 0, 0
+        for state in (ref() for ref in refs):
+            if state is None or state.spilled:
+                continue
+            resident += 1
+            try:
+                resident_bytes += len(_encode(state.values))
+            except (RuntimeError, TypeError, ValueError):
+                # Aktive Sitzung wurde während des Zählens verändert
+                pass
+        spilled, spilled_bytes = self.backend.stats()
+        return {
+            'resident_sessions': resident,
+            'resident_bytes': resident_bytes,
+            'spilled_sessions': spilled,
+            'spilled_bytes': spilled_bytes
+        }
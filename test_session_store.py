@@ -0,0 +1,204 @@
+import gc
+import math
+import os
+import stat
+import time
+
+import pytest
+
+from session_store import (DiskSessionBackend, SessionStateManager, SpillableState,
+                           env_seconds, load_backend_class)
+
+
+def make_state():
+    state = SpillableState()
+    state.initialized = True
+    state.current_test = [{'type': 'pattern', 'sequence': ['○', '●']}]
+    state.current_question = 1
+    state.score = 3
+    state.test_history = [{'question': 1, 'correct': True}]
+    state.test_active = True
+    state.show_result = False
+    state.current_answer = None
+    return state
+
+
+def spill_files(backend):
+    return sorted(os.listdir(backend.directory))
+
+
+def mode(path):
+    return stat.S_IMODE(os.stat(path).st_mode)
+
+
+@pytest.fixture
+def backend(tmp_path):
+    return DiskSessionBackend(str(tmp_path / 'sessions'))
+
+
+def test_backend_round_trip(backend):
+    data = dict(make_state().values)
+    size = backend.save('a', data)
+    assert backend.stats() == (1, size)
+    assert backend.load('a') == data
+    backend.delete('a')
+    assert backend.load('a') is None
+    assert backend.stats() == (0, 0)
+
+
+def test_created_directory_is_private(backend):
+    assert mode(backend.directory) == 0o700
+
+
+def test_existing_private_directory_is_used_unchanged(tmp_path):
+    directory = tmp_path / 'eigen'
+    directory.mkdir(mode=0o700)
+    backend = DiskSessionBackend(str(directory))
+    assert backend.directory == str(directory)
+    assert mode(directory) == 0o700
+
+
+@pytest.mark.skipif(os.name != 'posix', reason="POSIX-Rechte")
+def test_shared_directory_is_not_chmodded(tmp_path):
+    shared = tmp_path / 'shared'
+    shared.mkdir()
+    os.chmod(shared, 0o777)
+    foreign = shared / 'fremd.json.z'
+    foreign.write_bytes(b'fremd')
+    old = time.time() - 7200
+    os.utime(foreign, (old, old))
+
+    backend = DiskSessionBackend(str(shared))
+    assert mode(shared) == 0o777
+    assert os.path.dirname(backend.directory) == str(shared)
+    assert mode(backend.directory) == 0o700
+    assert backend.stats() == (0, 0)
+
+    backend.purge(3600)
+    assert foreign.exists()
+    # Ein neuer Prozess findet dasselbe Unterverzeichnis wieder
+    assert DiskSessionBackend(str(shared)).directory == backend.directory
+
+
+def test_failed_write_removes_temp_file(backend, monkeypatch):
+    backend.save('a', {'score': 1})
+    before = backend.stats()
+
+    def fail(src, dst):
+        raise OSError("kein Speicherplatz")
+    monkeypatch.setattr(os, 'replace', fail)
+    with pytest.raises(OSError):
+        backend.save('a', {'score': 2})
+    monkeypatch.undo()
+
+    assert spill_files(backend) == ['a.json.z']
+    assert backend.stats() == before
+    assert backend.load('a') == {'score': 1}
+
+
+def test_idle_sweep_spills_and_touch_restores(backend):
+    manager = SessionStateManager(backend, idle_seconds=0)
+    state = make_state()
+    expected = dict(state.values)
+    manager.touch(state)
+    manager.sweep()
+
+    assert state.spilled
+    assert 'initialized' not in state
+    stats = manager.stats()
+    assert stats['resident_sessions'] == 0
+    assert stats['spilled_sessions'] == 1
+
+    manager.touch(state)
+    assert state.values == expected
+    assert backend.stats() == (0, 0)
+    assert manager.stats()['resident_sessions'] == 1
+
+
+def test_sweep_skips_calling_session(backend):
+    manager = SessionStateManager(backend, idle_seconds=0)
+    state = make_state()
+    manager.touch(state)
+    manager.sweep(state)
+    assert state.score == 3
+    assert backend.stats() == (0, 0)
+
+
+def test_closed_session_is_dropped_with_its_spill_file(backend):
+    manager = SessionStateManager(backend, idle_seconds=0)
+    state = make_state()
+    manager.touch(state)
+    manager.sweep()
+    assert backend.stats()[0] == 1
+
+    del state
+    gc.collect()
+    manager._last_sweep = 0
+    manager.sweep()
+    assert manager.stats()['resident_sessions'] == 0
+    assert backend.stats() == (0, 0)
+
+
+def test_corrupt_file_falls_back_to_fresh_state(backend):
+    manager = SessionStateManager(backend, idle_seconds=0)
+    state = make_state()
+    manager.touch(state)
+    manager.sweep()
+    (name,) = spill_files(backend)
+    with open(os.path.join(backend.directory, name), 'wb') as f:
+        f.write(b'kein zlib')
+
+    manager.touch(state)
+    assert state.values == {}
+    assert not state.spilled
+    assert spill_files(backend) == []
+    assert backend.stats() == (0, 0)
+
+
+def test_failed_save_keeps_session_resident(backend, monkeypatch):
+    def fail(session_id, data):
+        raise OSError("kein Speicherplatz")
+    monkeypatch.setattr(backend, 'save', fail)
+    manager = SessionStateManager(backend, idle_seconds=0)
+    state = make_state()
+    manager.touch(state)
+    manager.sweep()
+    assert state.score == 3
+    assert not state.spilled
+    assert manager.stats()['resident_sessions'] == 1
+
+
+def test_purge_removes_old_files(backend):
+    backend.save('alt', {'score': 1})
+    backend.save('neu', {'score': 2})
+    old = time.time() - 7200
+    os.utime(os.path.join(backend.directory, 'alt.json.z'), (old, old))
+    backend.purge(3600)
+    assert backend.load('alt') is None
+    assert backend.load('neu') == {'score': 2}
+    assert backend.stats()[0] == 1
+
+
+@pytest.mark.parametrize('raw', ['nan', 'inf', '-inf', 'abc'])
+def test_env_seconds_rejects_invalid_values(monkeypatch, raw):
+    monkeypatch.setenv('JUSTIZ_TEST_SECONDS', raw)
+    assert env_seconds('JUSTIZ_TEST_SECONDS', 900, minimum=60) == 900
+
+
+def test_env_seconds_clamps_to_minimum(monkeypatch):
+    monkeypatch.setenv('JUSTIZ_TEST_SECONDS', '0')
+    assert env_seconds('JUSTIZ_TEST_SECONDS', 900, minimum=60) == 60
+    monkeypatch.setenv('JUSTIZ_TEST_SECONDS', '120')
+    assert env_seconds('JUSTIZ_TEST_SECONDS', 900, minimum=60) == 120
+    monkeypatch.delenv('JUSTIZ_TEST_SECONDS')
+    value = env_seconds('JUSTIZ_TEST_SECONDS', 900, minimum=60)
+    assert value == 900 and math.isfinite(value)
+
+
+def test_load_backend_class():
+    assert load_backend_class('disk') is DiskSessionBackend
+    assert load_backend_class('session_store:DiskSessionBackend') is DiskSessionBackend
+    with pytest.raises(ValueError):
+        load_backend_class('unbekannt')
+    with pytest.raises(ValueError):
+        load_backend_class('session_store:SessionStateManager')